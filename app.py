@@ -1,126 +1,473 @@
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import json
 import random
+import numpy as np
 import openai
 import pandas as pd
 import streamlit as st
 from dotenv import load_dotenv
+from openai import AsyncOpenAI
+import io
 import os
 import re
 
+try:
+    # Persist OpenAI responses across Streamlit reruns when diskcache is installed
+    import diskcache
+    _name_cache = diskcache.Cache("./.openai_cache")
+except ImportError:
+    _name_cache = {}
+
+try:
+    from numba import njit
+except ImportError:  # Numba is optional; generation falls back to the NumPy path
+    njit = None
+
 load_dotenv()
 api_key = os.getenv("OPENAI_API_KEY")
-openai.api_key = api_key
+
+_openai_client = None
+
+def get_openai_client():
+    """Create the shared AsyncOpenAI client on first use."""
+    global _openai_client
+    if _openai_client is None:
+        _openai_client = AsyncOpenAI(api_key=api_key)
+    return _openai_client
+
+async def chat_completion_with_retry(messages, retries=3, **kwargs):
+    """Call the chat completions API with exponential-backoff retries."""
+    for attempt in range(retries):
+        try:
+            return await get_openai_client().chat.completions.create(
+                model="gpt-4o",
+                messages=messages,
+                **kwargs
+            )
+        except (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError):
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(2 ** attempt)
+
+REQUIRED_COLUMNS = ['Recording Artist', 'Recording Title', 'ISRC']
+OPTIONAL_COLUMNS = ['Number of Streams']
+
+# Characters Excel forbids in sheet names
+_SHEET_SANITIZE = re.compile(r'[\\/*?:\[\]]')
+
+# One name per line, tolerating numbering and quotes, should the model ever
+# reply with plain text instead of the requested JSON
+_NAME_RE = re.compile(r'^\s*(?:\d+[.)]\s*)?["“]?(.+?)["”]?\s*$', re.M)
+
+def _sheet_to_frame(worksheet, wanted_columns):
+    """Stream a read-only worksheet into a DataFrame, keeping only wanted columns."""
+    rows = worksheet.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return pd.DataFrame()
+    keep = [i for i, name in enumerate(header) if name in wanted_columns]
+    records = ([row[i] if i < len(row) else None for i in keep] for row in rows)
+    return pd.DataFrame(records, columns=[header[i] for i in keep])
+
+def _load_sheets_openpyxl(file_bytes):
+    """openpyxl fallback: read_only mode streams rows instead of building the DOM."""
+    from openpyxl import load_workbook
+    workbook = load_workbook(io.BytesIO(file_bytes), read_only=True, data_only=True)
+    try:
+        data = _sheet_to_frame(workbook.worksheets[0], REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+        inspiration_data = _sheet_to_frame(workbook["Playlist Titles"], ["Playlist Titles"])
+    finally:
+        workbook.close()
+    return data, inspiration_data
+
+@st.cache_data(show_spinner=False)
+def load_excel(file_bytes):
+    """Parse both workbook sheets once per distinct upload; reruns hit the cache."""
+    try:
+        # The Rust-backed calamine engine decodes xlsx several times faster
+        # than openpyxl; fall back when it is not installed
+        xl = pd.ExcelFile(io.BytesIO(file_bytes), engine='calamine')
+    except ImportError:
+        return _load_sheets_openpyxl(file_bytes)
+    data = xl.parse(0, usecols=lambda col: col in REQUIRED_COLUMNS + OPTIONAL_COLUMNS)
+    inspiration_data = xl.parse("Playlist Titles", usecols=lambda col: col == "Playlist Titles")
+    return data, inspiration_data
 
 def validate_playlist_rules(data, num_playlists, tracks_per_playlist):
     """Validate if the playlists can be created based on the rules."""
-    unique_artists = data['artist'].nunique()
-    total_tracks = len(data)
-
-    max_tracks_by_artist = 3 * unique_artists * num_playlists
-    if total_tracks < tracks_per_playlist * num_playlists:
+    # Cheap O(1) length check first; only count artists when it passes
+    tracks_needed = tracks_per_playlist * num_playlists
+    if len(data) < tracks_needed:
         return False, "Error: Archivo con data menor a tus solicitud. Ajusta la cantidad de playlists y tracks e intentalo de nuevo."
-    if max_tracks_by_artist < tracks_per_playlist * num_playlists:
+
+    artist_col = data['artist']
+    # Categorical artists expose their cardinality without rehashing the column
+    unique_artists = artist_col.cat.categories.size if hasattr(artist_col, 'cat') else artist_col.nunique()
+    if 3 * unique_artists * num_playlists < tracks_needed:
         return False, "Too many restrictions for the available tracks."
     return True, "Valid playlist configuration."
 
-def generate_playlists(data, num_playlists, tracks_per_playlist):
-    """Generate playlists based on the rules."""
-    playlists = []
-    used_isrcs = set()  # Track ISRCs globally across all playlists
-
-    for _ in range(num_playlists):
-        playlist = []
-        used_artists = {}
-        remaining_tracks = data.copy()
-
-        while len(playlist) < tracks_per_playlist:
-            valid_tracks = remaining_tracks[~remaining_tracks['artist'].isin(
-                [artist for artist, count in used_artists.items() if count >= 3]
-            ) & ~remaining_tracks['isrc'].isin(used_isrcs)]
-
-            if valid_tracks.empty:
-                break
-
-            if 'streams' in valid_tracks.columns:
-                valid_tracks = valid_tracks.copy()  # Prevent SettingWithCopyWarning
-                valid_tracks['weight'] = valid_tracks['streams'] / valid_tracks['streams'].sum()
-                selected_track = valid_tracks.sample(1, weights='weight').iloc[0]
+def _pick_playlist(artist_codes, weights, valid, max_per_artist, k, seed):
+    """Pick up to k rows honoring the artist cap and no-consecutive-artist rule.
+
+    Weighted sampling without replacement via Efraimidis-Spirakis keys: one
+    log(u)/w draw and one sort, then a walk down the priority order. Compiled
+    by Numba when it is installed. Marks picked rows invalid in place and
+    returns their indices.
+    """
+    np.random.seed(seed)
+    n = artist_codes.size
+    n_artists = 0
+    for i in range(n):
+        if artist_codes[i] + 1 > n_artists:
+            n_artists = artist_codes[i] + 1
+
+    keys = np.log(np.random.random(n)) / weights
+    order = np.argsort(-keys)
+
+    counts = np.zeros(n_artists, np.int32)
+    chosen = np.empty(k, np.int64)
+    deferred = np.empty(n, np.int64)
+    n_deferred = 0
+    picked = 0
+    last_artist = -1
+
+    for oi in range(n):
+        if picked == k:
+            break
+        i = order[oi]
+        if not valid[i] or counts[artist_codes[i]] >= max_per_artist:
+            continue
+        if artist_codes[i] == last_artist:
+            # Would repeat the previous artist; retry once the run is broken
+            deferred[n_deferred] = i
+            n_deferred += 1
+            continue
+        valid[i] = False
+        counts[artist_codes[i]] += 1
+        last_artist = artist_codes[i]
+        chosen[picked] = i
+        picked += 1
+
+        # Deferred rows outrank anything later in the order, so they get
+        # first refusal after every placement
+        progress = True
+        while n_deferred > 0 and progress and picked < k:
+            progress = False
+            for pos in range(n_deferred):
+                j = deferred[pos]
+                if valid[j] and artist_codes[j] != last_artist and counts[artist_codes[j]] < max_per_artist:
+                    valid[j] = False
+                    counts[artist_codes[j]] += 1
+                    last_artist = artist_codes[j]
+                    chosen[picked] = j
+                    picked += 1
+                    for q in range(pos, n_deferred - 1):
+                        deferred[q] = deferred[q + 1]
+                    n_deferred -= 1
+                    progress = True
+                    break
+
+    return chosen[:picked]
+
+if njit is not None:
+    _pick_playlist = njit(cache=True)(_pick_playlist)
+
+# Below this many playlists the process-pool startup costs more than it saves
+PARALLEL_PLAYLIST_THRESHOLD = 8
+
+def _generate_one_partition(args):
+    """Process-pool worker: pick one playlist inside its own row partition."""
+    artist_codes, weights, rows, tracks_per_playlist, seed = args
+    valid = np.ones(rows.size, dtype=bool)
+    local = _pick_playlist(artist_codes[rows], weights[rows], valid, 3, tracks_per_playlist, seed)
+    return rows[local]
+
+def _top_up_playlist(chosen, artist_codes, weights, unused, tracks_per_playlist, rng):
+    """Extend an under-filled playlist from rows no other playlist used.
+
+    Draws fresh Efraimidis-Spirakis keys and walks them with the playlist's
+    existing artist counts, so the cap and no-consecutive-artist rule stay
+    intact across the seam. Clears taken rows from `unused` in place.
+    """
+    n_artists = int(artist_codes.max()) + 1 if artist_codes.size else 0
+    counts = np.zeros(n_artists, dtype=np.int32)
+    for j in chosen:
+        counts[artist_codes[j]] += 1
+    last_artist = artist_codes[chosen[-1]] if chosen.size else -1
+
+    with np.errstate(divide='ignore'):
+        keys = np.log(rng.random(artist_codes.size)) / weights
+    order = np.argsort(-keys)
+
+    picks = list(chosen)
+    deferred = []
+    for i in order:
+        if len(picks) == tracks_per_playlist:
+            break
+        if not unused[i] or counts[artist_codes[i]] >= 3:
+            continue
+        if artist_codes[i] == last_artist:
+            # Would repeat the previous artist; retry once the run is broken
+            deferred.append(i)
+            continue
+        unused[i] = False
+        counts[artist_codes[i]] += 1
+        last_artist = artist_codes[i]
+        picks.append(i)
+
+        while deferred and len(picks) < tracks_per_playlist:
+            for pos, j in enumerate(deferred):
+                if artist_codes[j] != last_artist and counts[artist_codes[j]] < 3:
+                    deferred.pop(pos)
+                    unused[j] = False
+                    counts[artist_codes[j]] += 1
+                    last_artist = artist_codes[j]
+                    picks.append(j)
+                    break
             else:
-                # If no 'streams' column, select randomly
-                selected_track = valid_tracks.sample(1).iloc[0]
-
-            # Ensure no consecutive tracks by the same artist
-            if playlist and playlist[-1]['artist'] == selected_track['artist']:
-                continue
-
-            playlist.append(selected_track)
+                break
 
-            # Update artist usage, used ISRCs, and remaining tracks
-            artist = selected_track['artist']
-            used_artists[artist] = used_artists.get(artist, 0) + 1
-            used_isrcs.add(selected_track['isrc'])
-            remaining_tracks = remaining_tracks[remaining_tracks['isrc'] != selected_track['isrc']]
+    return np.asarray(picks, dtype=np.int64)
+
+def generate_playlists(data, num_playlists, tracks_per_playlist, seed=None):
+    """Generate playlists based on the rules.
+
+    Returns one array of chosen row positions per playlist; callers gather the
+    actual rows with a single data.iloc per playlist.
+    """
+    data = data.reset_index(drop=True)
+    streams = data['streams'].to_numpy(dtype=np.float64) if 'streams' in data.columns else None
+    rng = np.random.default_rng(seed)
+
+    # An ISRC may be used once across all playlists even when it occurs in
+    # several rows: only the first occurrence of each code stays eligible
+    eligible = (~data['isrc'].duplicated()).to_numpy()
+
+    if num_playlists >= PARALLEL_PLAYLIST_THRESHOLD:
+        # Partition rows by ISRC hash up front so workers cannot collide on a
+        # track, then build every playlist concurrently across cores
+        artist_codes = pd.factorize(data['artist'])[0].astype(np.int32)
+        weights = streams if streams is not None else np.ones(len(data), dtype=np.float64)
+        partition = pd.util.hash_array(data['isrc'].to_numpy()) % num_playlists
+        jobs = [(artist_codes, weights, np.flatnonzero((partition == j) & eligible),
+                 tracks_per_playlist, int(rng.integers(2 ** 31 - 1)))
+                for j in range(num_playlists)]
+        with ProcessPoolExecutor() as executor:
+            index_lists = list(executor.map(_generate_one_partition, jobs))
+
+        # Hash partitions routinely hold fewer usable rows than a playlist
+        # needs; refill the short ones sequentially from rows no worker took
+        unused = eligible.copy()
+        for chosen in index_lists:
+            unused[chosen] = False
+        for j, chosen in enumerate(index_lists):
+            if chosen.size < tracks_per_playlist:
+                index_lists[j] = _top_up_playlist(chosen, artist_codes, weights, unused,
+                                                  tracks_per_playlist, rng)
+        return index_lists
+
+    if njit is not None:
+        artist_codes = pd.factorize(data['artist'])[0].astype(np.int32)
+        weights = streams if streams is not None else np.ones(len(data), dtype=np.float64)
+        global_valid = eligible.copy()
+        index_lists = []
+        for _ in range(num_playlists):
+            valid = global_valid.copy()
+            chosen = _pick_playlist(artist_codes, weights, valid, 3, tracks_per_playlist,
+                                    int(rng.integers(2 ** 31 - 1)))
+            global_valid[chosen] = False
+            index_lists.append(chosen)
+        return index_lists
+
+    # NumPy fallback: one shared Efraimidis-Spirakis pass fills every playlist.
+    # log(u)/w orders rows identically to the u**(1/w) key without underflow;
+    # the walk assigns each row to the first playlist that can take it.
+    n = len(data)
+    artist_codes = pd.factorize(data['artist'])[0]
+    n_artists = int(artist_codes.max()) + 1 if n else 0
+
+    with np.errstate(divide='ignore'):
+        keys = np.log(rng.random(n))
+        if streams is not None:
+            keys = keys / streams
+    order = np.argsort(-keys)
+
+    counts = np.zeros((num_playlists, n_artists), dtype=np.int32)
+    chosen = [[] for _ in range(num_playlists)]
+    last_artist = np.full(num_playlists, -1, dtype=np.int64)
+    deferred = []
+    total_needed = num_playlists * tracks_per_playlist
+    placed = 0
+
+    def try_place(j):
+        a = artist_codes[j]
+        for p in range(num_playlists):
+            if len(chosen[p]) < tracks_per_playlist and counts[p, a] < 3 and last_artist[p] != a:
+                chosen[p].append(j)
+                counts[p, a] += 1
+                last_artist[p] = a
+                return True
+        return False
+
+    for i in order:
+        if placed == total_needed:
+            break
+        if not eligible[i]:
+            continue
+        if not try_place(i):
+            # Every open playlist would repeat this artist; retry later
+            deferred.append(i)
+            continue
+        placed += 1
+
+        # Each placement breaks an artist run, so deferred rows (which outrank
+        # anything later in the order) get first refusal
+        progress = True
+        while deferred and progress and placed < total_needed:
+            progress = False
+            for pos, j in enumerate(deferred):
+                if try_place(j):
+                    deferred.pop(pos)
+                    placed += 1
+                    progress = True
+                    break
+
+    return [np.asarray(c, dtype=np.int64) for c in chosen]
+
+@st.cache_data(show_spinner=False)
+def generate_playlists_cached(data, num_playlists, tracks_per_playlist, seed=None):
+    """Memoize generation so Streamlit reruns with unchanged inputs skip the work."""
+    return generate_playlists(data, num_playlists, tracks_per_playlist, seed)
+
+async def suggest_playlist_names(song_titles, inspiration_titles, num_playlists, language, adjectives, slang):
+    """Infer the playlist theme and suggest names in a single OpenAI call."""
+    try:
+        # Key the cache on the request configuration, not the exact prompt, so
+        # the randomly drawn inspiration title cannot defeat repeat lookups
+        cache_key = hashlib.sha256(json.dumps(
+            [sorted(song_titles), sorted(adjectives or []), slang, language, num_playlists]
+        ).encode("utf-8")).hexdigest()
+        if cache_key in _name_cache:
+            return list(_name_cache[cache_key])
 
-        playlists.append(pd.DataFrame(playlist))
-    return playlists
+        adjective_list = ", ".join(adjectives) if adjectives else "fun and unique"
+        inspiration_titles_text = random.choice(inspiration_titles) if inspiration_titles else ""
+        slang_text = f"using {slang} slang." if slang else ""
 
-def analyze_playlist_theme(song_titles, language):
-    """Analyze the playlist theme using OpenAI."""
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": f"Analyze the theme of the following playlist songs in {language}."},
-                {"role": "user", "content": ", ".join(song_titles)}
-            ]
-        )
-        if 'choices' in response:
-            return response['choices'][0]['message']['content'].strip()
+        messages = [
+            {"role": "system", "content": (
+                f"First infer the playlist theme from the song titles the user provides, "
+                f"then suggest creative playlist names for that theme in {language}. {slang_text} "
+                f'Respond with a JSON object of the form {{"names": ["...", ...]}}.'
+            )},
+            {"role": "user", "content": (
+                f"Song titles: {', '.join(song_titles)}. "
+                f"Use this inspiration: '{inspiration_titles_text}'. "
+                f"Generate {num_playlists} playlist names that are {adjective_list}."
+            )}
+        ]
+
+        response = await chat_completion_with_retry(messages, response_format={"type": "json_object"})
+        content = response.choices[0].message.content
+        if content:
+            try:
+                names = json.loads(content).get("names", [])
+            except json.JSONDecodeError:
+                names = _NAME_RE.findall(content)
+            playlist_names = [str(name).strip() for name in names if str(name).strip()][:num_playlists]
+            _name_cache[cache_key] = playlist_names
+            return playlist_names
         else:
-            return "Unknown Theme"
+            st.error("Unexpected response format from OpenAI API.")
+            return [f"Playlist {i + 1}" for i in range(num_playlists)]
     except Exception as e:
         st.error(f"Error with OpenAI API: {e}")
-        return "Unknown Theme"
+        return [f"Playlist {i + 1}" for i in range(num_playlists)]
+
+async def suggest_playlist_names_batch(song_titles, inspiration_titles, num_playlists, language, adjectives, slang):
+    """Suggest playlist names through the OpenAI Batch API.
 
-def suggest_playlist_names(theme, inspiration_titles, num_playlists, language, adjectives, slang):
-    """Use OpenAI API to suggest playlist names based on the theme."""
+    Batched requests cost 50% less and draw from a separate rate-limit pool,
+    at the price of queueing latency — meant for jobs with many playlists.
+    """
     try:
+        client = get_openai_client()
         adjective_list = ", ".join(adjectives) if adjectives else "fun and unique"
-        inspiration_titles_text = random.choice(inspiration_titles) if inspiration_titles else ""
         slang_text = f"using {slang} slang." if slang else ""
 
-        response = openai.ChatCompletion.create(
-            model="gpt-4",
-            messages=[
-                {"role": "system", "content": f"Suggest creative playlist names based on the theme: '{theme}' in {language}. {slang_text}"},
-                {"role": "user", "content": f"Use this inspiration: '{inspiration_titles_text}'. Generate {num_playlists} playlist names that are {adjective_list}."}
-            ]
+        requests_jsonl = "\n".join(json.dumps({
+            "custom_id": f"playlist-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": "gpt-4o",
+                "messages": [
+                    {"role": "system", "content": (
+                        f"First infer the playlist theme from the song titles the user provides, "
+                        f"then suggest one creative playlist name for that theme in {language}. {slang_text} "
+                        f'Respond with a JSON object of the form {{"names": ["..."]}}.'
+                    )},
+                    {"role": "user", "content": (
+                        f"Song titles: {', '.join(song_titles)}. "
+                        f"Use this inspiration: '{random.choice(inspiration_titles) if inspiration_titles else ''}'. "
+                        f"Generate 1 playlist name that is {adjective_list}."
+                    )}
+                ],
+                "response_format": {"type": "json_object"}
+            }
+        }) for i in range(num_playlists))
+
+        batch_file = await client.files.create(
+            file=("playlist_names.jsonl", requests_jsonl.encode("utf-8")),
+            purpose="batch"
         )
-        if 'choices' in response:
-            playlist_names = response['choices'][0]['message']['content'].split("\n")
-            return [name.split(".", 1)[-1].strip().strip('"') for name in playlist_names if name.strip()][:num_playlists]
-        else:
-            st.error("Unexpected response format from OpenAI API.")
+        batch = await client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+
+        delay = 1
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60)
+            batch = await client.batches.retrieve(batch.id)
+
+        if batch.status != "completed":
+            st.error(f"OpenAI batch ended with status '{batch.status}'.")
             return [f"Playlist {i + 1}" for i in range(num_playlists)]
+
+        output = await client.files.content(batch.output_file_id)
+        playlist_names = [f"Playlist {i + 1}" for i in range(num_playlists)]
+        for line in output.text.splitlines():
+            result = json.loads(line)
+            i = int(result["custom_id"].split("-", 1)[1])
+            content = result["response"]["body"]["choices"][0]["message"]["content"]
+            names = json.loads(content).get("names", [])
+            if names and str(names[0]).strip():
+                playlist_names[i] = str(names[0]).strip()
+        return playlist_names
     except Exception as e:
-        st.error(f"Error with OpenAI API: {e}")
+        st.error(f"Error with OpenAI Batch API: {e}")
         return [f"Playlist {i + 1}" for i in range(num_playlists)]
 
-def process_playlists(file, num_playlists, tracks_per_playlist, language, use_openai, adjectives, slang):
+async def process_playlists(file, num_playlists, tracks_per_playlist, language, use_openai, adjectives, slang, use_batch_api=False, seed=None):
     """Main function to process playlists and return results."""
     try:
-        data = pd.read_excel(file, sheet_name=0)
-        inspiration_data = pd.read_excel(file, sheet_name="Playlist Titles")
+        # Blocking Excel parse runs in a worker thread, off the event loop;
+        # load_excel caches on the raw bytes so reruns skip the parse entirely
+        data, inspiration_data = await asyncio.to_thread(load_excel, file.getvalue())
     except Exception as e:
         return f"Error reading Excel file: {e}", None
 
-    required_columns = ['Recording Artist', 'Recording Title', 'ISRC']
-    optional_columns = ['Number of Streams']
-
-    if not all(col in data.columns for col in required_columns):
+    if not all(col in data.columns for col in REQUIRED_COLUMNS):
         return ("The uploaded file does not contain the required columns: "
                 "'Recording Artist', 'Recording Title', 'ISRC'. Please check your file and try again."), None
 
-    data = data[required_columns + [col for col in optional_columns if col in data.columns]]
+    data = data[REQUIRED_COLUMNS + [col for col in OPTIONAL_COLUMNS if col in data.columns]]
     data.rename(columns={
         'Recording Artist': 'artist',
         'Recording Title': 'title',
@@ -129,17 +476,34 @@ def process_playlists(file, num_playlists, tracks_per_playlist, language, use_op
     }, inplace=True)
     data.dropna(inplace=True)
 
+    # Structural pruning: a duplicated ISRC can never be picked twice and a
+    # zero-stream track can never be sampled, so dropping them up front
+    # shrinks every downstream pass; float32 halves the weight column
+    data = data.drop_duplicates('isrc')
+    if 'streams' in data.columns:
+        data = data[data['streams'] > 0]
+        data['streams'] = data['streams'].astype(np.float32)
+
+    # Hot string columns: categorical artists compare by integer code, and
+    # arrow-backed ISRCs avoid Python object hashing where pyarrow is available
+    data['artist'] = data['artist'].astype('category')
+    try:
+        data['isrc'] = data['isrc'].astype('string[pyarrow]')
+    except ImportError:
+        pass
+
     is_valid, message = validate_playlist_rules(data, num_playlists, tracks_per_playlist)
     if not is_valid:
         return message, None
 
-    playlists = generate_playlists(data, num_playlists, tracks_per_playlist)
+    index_lists = generate_playlists_cached(data, num_playlists, tracks_per_playlist, seed)
+    playlists = [data.iloc[idx].reset_index(drop=True) for idx in index_lists]
 
     if use_openai:
-        song_titles = [track['title'] for playlist in playlists for _, track in playlist.iterrows()]
-        theme = analyze_playlist_theme(song_titles, language)
+        song_titles = np.concatenate([p['title'].to_numpy() for p in playlists]).tolist()
         inspiration_titles = inspiration_data['Playlist Titles'].dropna().tolist()
-        playlist_names = suggest_playlist_names(theme, inspiration_titles, num_playlists, language, adjectives, slang)
+        suggest = suggest_playlist_names_batch if use_batch_api else suggest_playlist_names
+        playlist_names = await suggest(song_titles, inspiration_titles, num_playlists, language, adjectives, slang)
         if len(playlist_names) < len(playlists):
             playlist_names += [f"Playlist {i + 1}" for i in range(len(playlist_names), len(playlists))]
     else:
@@ -147,26 +511,37 @@ def process_playlists(file, num_playlists, tracks_per_playlist, language, use_op
 
     results = []
     for i, playlist in enumerate(playlists):
-        playlist['Playlist Name'] = st.text_input(f"Edit Playlist Name for Playlist {i + 1}", value=playlist_names[i])
-        playlist['Exclude from Excel'] = st.checkbox(f"Exclude Playlist {i + 1} from Excel")
+        playlist['Playlist Name'] = playlist_names[i]
+        playlist['Exclude from Excel'] = False
         results.append(playlist[['Playlist Name', 'artist', 'title', 'isrc', 'Exclude from Excel'] + (['streams'] if 'streams' in data.columns else [])])
 
     return "Playlists generated successfully!", results
 
-def save_to_excel(playlists, output_filename):
-    """Save playlists to an Excel file with each playlist as a separate sheet."""
-    with pd.ExcelWriter(output_filename) as writer:
+def save_to_excel(playlists, output):
+    """Save playlists to an Excel path or file-like, one sheet per playlist."""
+    # Note: xlsxwriter's constant_memory mode cannot be used here — to_excel
+    # emits cells column-major, and constant-memory mode silently drops writes
+    # to rows it has already flushed, truncating every sheet to one column
+    with pd.ExcelWriter(output, engine='xlsxwriter',
+                        engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
         for i, playlist in enumerate(playlists):
             if not playlist['Exclude from Excel'].iloc[0]:
-                sheet_name = re.sub(r'[\\/*?:\[\]]', '_', playlist['Playlist Name'].iloc[0])[:31]  # Ensure sheet name is valid
+                sheet_name = _SHEET_SANITIZE.sub('_', playlist['Playlist Name'].iloc[0])[:31]  # Ensure sheet name is valid
                 playlist.to_excel(writer, sheet_name=sheet_name, index=False)
 
+async def export_playlists(playlists):
+    """Build the workbook in memory on a worker thread and return its bytes."""
+    buffer = io.BytesIO()
+    await asyncio.to_thread(save_to_excel, playlists, buffer)
+    return buffer.getvalue()
+
 # Streamlit Interface
 st.title("Playlist Generator")
 st.write("Upload an Excel file to generate playlists with specific rules.")
 
 uploaded_file = st.file_uploader("Upload Excel File", type=["xlsx"])
 use_openai = st.checkbox("Use OpenAI for Playlist Names")
+use_batch_api = False
 adjectives = []
 adjectives_file = "adjectives.txt"
 slang_file = "slang.txt"
@@ -186,6 +561,8 @@ if use_openai:
 
     language = st.selectbox("Select Language for Playlist Names", ["English", "Spanish", "French", "German"])
 
+    use_batch_api = st.checkbox("Use OpenAI Batch API (cheaper, for many playlists — may take a while)")
+
     use_slang = st.checkbox("Enable Slang Role")
     if use_slang:
         try:
@@ -200,25 +577,46 @@ tracks_per_playlist = st.number_input("Tracks per Playlist", min_value=1, value=
 
 if st.button("Create Playlists"):
     if uploaded_file is not None:
+        # One seed per session keeps reruns reproducible and cache-friendly
+        seed = st.session_state.setdefault("generation_seed", random.randrange(2 ** 32))
         with st.spinner("Processing playlists..."):
-            message, playlists = process_playlists(uploaded_file, num_playlists, tracks_per_playlist, language if use_openai else None, use_openai, adjectives, slang)
-
-        st.write(message)
-
-        if playlists:
-            for i, playlist in enumerate(playlists):
-                st.subheader(f"{playlist['Playlist Name'].iloc[0]}")
-                st.write(playlist.to_html(index=False, escape=False), unsafe_allow_html=True)
-
-            # Add a download button for the Excel file
-            output_filename = "playlists.xlsx"
-            save_to_excel(playlists, output_filename)
-            with open(output_filename, "rb") as file:
-                st.download_button(
-                    label="Download Playlists as Excel",
-                    data=file,
-                    file_name=output_filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-        else:
-            st.error("Error: Archivo con data menor a tus solicitud. Ajusta la cantidad de playlists y tracks e intentalo de nuevo.")
+            message, playlists = asyncio.run(process_playlists(uploaded_file, num_playlists, tracks_per_playlist, language if use_openai else None, use_openai, adjectives, slang, use_batch_api, seed))
+
+        # Persist the results: editor interactions rerun the script with the
+        # button back to False, and the playlists must survive that rerun
+        st.session_state["playlists_message"] = message
+        st.session_state["playlists"] = playlists
+
+if "playlists_message" in st.session_state:
+    st.write(st.session_state["playlists_message"])
+    playlists = st.session_state["playlists"]
+
+    if playlists:
+        # One batched editor per playlist instead of a widget per field:
+        # edits land in the editor state without re-running the pipeline
+        edited_playlists = []
+        for i, playlist in enumerate(playlists):
+            st.subheader(f"{playlist['Playlist Name'].iloc[0]}")
+            edited = st.data_editor(
+                playlist,
+                key=f"playlist_editor_{i}",
+                num_rows="fixed",
+                hide_index=True,
+                column_config={
+                    "Exclude from Excel": st.column_config.CheckboxColumn("Exclude from Excel")
+                }
+            )
+            edited_playlists.append(edited)
+
+        # Add a download button for the Excel file; the workbook is rebuilt
+        # from the editors' current state, so exclusions and renamed
+        # playlists from this rerun are what lands in the download
+        excel_bytes = asyncio.run(export_playlists(edited_playlists))
+        st.download_button(
+            label="Download Playlists as Excel",
+            data=excel_bytes,
+            file_name="playlists.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        )
+    else:
+        st.error("Error: Archivo con data menor a tus solicitud. Ajusta la cantidad de playlists y tracks e intentalo de nuevo.")